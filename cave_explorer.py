@@ -3,6 +3,7 @@
 import rospy
 import roslib
 import math
+import array
 import cv2 # OpenCV2
 from cv_bridge import CvBridge, CvBridgeError
 import numpy as np
@@ -20,33 +21,52 @@ from move_base_msgs.msg import MoveBaseAction, MoveBaseActionGoal
 import actionlib
 import random
 import copy
-from threading import Lock
+from threading import Lock, Event
 from enum import Enum
 
 
 def wrap_angle(angle):
     # Function to wrap an angle between 0 and 2*Pi
-    while angle < 0.0:
-        angle = angle + 2 * math.pi
+    return angle % (2 * math.pi)
 
-    while angle > 2 * math.pi:
-        angle = angle - 2 * math.pi
 
-    return angle
-
-
-def pose2d_to_pose(pose_2d):
-    pose = Pose()
+def pose2d_to_pose(pose_2d, pose=None):
+    # Fills in "pose" when given, so an existing message can be reused
+    if pose is None:
+        pose = Pose()
 
     pose.position.x = pose_2d.x
     pose.position.y = pose_2d.y
 
-    pose.orientation.w = math.cos(pose_2d.theta)
+    pose.orientation.w = math.cos(pose_2d.theta / 2.0)
     pose.orientation.z = math.sin(pose_2d.theta / 2.0)
 
     return pose
 
 
+def detect_frontiers(map_data):
+    # Frontiers are free cells (0) with at least one unknown (-1) cell in their 3x3 neighbourhood
+    free_mask = map_data == 0
+    unknown_mask = map_data == -1
+    unknown_dilated = cv2.dilate(unknown_mask.view(np.uint8), np.ones((3, 3), np.uint8)) > 0
+
+    return free_mask & unknown_dilated
+
+
+def update_frontiers(frontier_mask, map_data, y_min, y_max, x_min, x_max):
+    # Re-detect the frontiers inside the window [y_min:y_max, x_min:x_max] and write them into "frontier_mask"
+    if y_min >= y_max or x_min >= x_max:
+        return
+
+    # Pad the window by one cell so the neighbourhood check sees the cells just outside it
+    height, width = map_data.shape
+    pad_y_min, pad_y_max = max(0, y_min - 1), min(height, y_max + 1)
+    pad_x_min, pad_x_max = max(0, x_min - 1), min(width, x_max + 1)
+
+    window = detect_frontiers(map_data[pad_y_min:pad_y_max, pad_x_min:pad_x_max])
+    frontier_mask[y_min:y_max, x_min:x_max] = window[y_min - pad_y_min:y_max - pad_y_min, x_min - pad_x_min:x_max - pad_x_min]
+
+
 class PlannerType(Enum):
     ERROR = 0
     MOVE_FORWARDS = 1
@@ -64,6 +84,13 @@ class CaveExplorer:
         self.localised_ = False
         self.artifact_found_ = False
         self.grid_map_ = None
+        self.last_pose_ = None # last robot pose successfully looked up from tf
+        self.map_np_ = None # numpy copy of the latest map, cached in "map_callback"
+        self.map_info_ = None # metadata (size, resolution, origin) matching "map_np_"
+        self.frontier_mask_ = None # frontier cells of "map_np_", updated incrementally in "map_callback"
+        self.frontier_origin_ = None # map origin "frontier_mask_" was computed for
+        self.map_version_ = 0 # incremented every time a new map is received
+        self.map_lock_ = Lock()
 
         # Variables/Flags for planning
         self.planner_type_ = PlannerType.ERROR
@@ -73,6 +100,11 @@ class CaveExplorer:
         self.finised_exploring = False
         self.rotate_ = False
         self.goal_counter_ = 0 # gives each goal sent to move_base a unique ID
+        self.need_replan_ = Event() # set when move_base finishes a goal, to wake up "main_loop" straight away
+
+        # Goal message reused by every planner, rather than building a new one for each goal
+        self.action_goal_ = MoveBaseActionGoal()
+        self.action_goal_.goal.target_pose.header.frame_id = "map"
 
         # Initialise CvBridge
         self.cv_bridge_ = CvBridge()
@@ -101,8 +133,28 @@ class CaveExplorer:
         self.computer_vision_model_filename_ = rospy.get_param("~computer_vision_model_filename")
         self.computer_vision_model_ = cv2.CascadeClassifier(self.computer_vision_model_filename_)
 
+        # Use the CUDA cascade classifier instead when a GPU is available
+        # It needs a cascade in the old (CUDA compatible) format, which can be given as a separate parameter
+        self.cuda_computer_vision_model_ = None
+        if hasattr(cv2, 'cuda') and cv2.cuda.getCudaEnabledDeviceCount() > 0:
+            cuda_model_filename = rospy.get_param("~cuda_computer_vision_model_filename", self.computer_vision_model_filename_)
+            try:
+                self.cuda_computer_vision_model_ = cv2.cuda.CascadeClassifier_create(cuda_model_filename)
+                self.cuda_computer_vision_model_.setScaleFactor(1.2)
+                self.cuda_computer_vision_model_.setMinNeighbors(3)
+                self.cuda_computer_vision_model_.setMinObjectSize((20, 20))
+                rospy.loginfo("Using the CUDA cascade classifier")
+            except cv2.error as e:
+                self.cuda_computer_vision_model_ = None
+                rospy.logwarn(f"Could not load the CUDA cascade classifier, falling back to CPU: {e}")
+
+        # Held while a frame is being processed, so frames arriving meanwhile are dropped
+        self.detection_lock_ = Lock()
+
         # Subscribe to the camera topic
-        self.image_sub_ = rospy.Subscriber("/camera/rgb/image_raw", Image, self.image_callback, queue_size=1)
+        # Only the raw transport is used; the camera's compressed/theora publishers only encode for their own subscribers
+        # buff_size must fit a whole image, otherwise frames queue up in the socket instead of being dropped
+        self.image_sub_ = rospy.Subscriber("/camera/rgb/image_raw", Image, self.image_callback, queue_size=1, buff_size=2**24)
 
         # Subscribe to the map topic
         self.grid_map_sub_ = rospy.Subscriber('/map', OccupancyGrid, self.map_callback)
@@ -147,49 +199,112 @@ class CaveExplorer:
         # A simple method has been provided to begin with for detecting stop signs (which is not what we're actually looking for) 
         # adapted from: https://www.geeksforgeeks.org/detect-an-object-with-opencv-python/
 
-        # Copy the image message to a cv image
-        # see http://wiki.ros.org/cv_bridge/Tutorials/ConvertingBetweenROSImagesAndOpenCVImagesPython
-        image = self.cv_bridge_.imgmsg_to_cv2(image_msg, desired_encoding='passthrough')
-
-        # Create a grayscale version, since the simple model below uses this
-        image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-
-        # Retrieve the pre-trained model
-        stop_sign_model = self.computer_vision_model_
-
-        # Detect artifacts in the image
-        # The minSize is used to avoid very small detections that are probably noise
-        detections = stop_sign_model.detectMultiScale(image, minSize=(20,20))
-
-        # You can set "artifact_found_" to true to signal to "main_loop" that you have found a artifact
-        # You may want to communicate more information
-        # Since the "image_callback" and "main_loop" methods can run at the same time you should protect any shared variables
-        # with a mutex
-        # "artifact_found_" doesn't need a mutex because it's an atomic
-        num_detections = len(detections)
-
-        if num_detections > 0:
-            self.artifact_found_ = True
-        else:
-            self.artifact_found_ = False
+        # Drop this frame if the previous one is still being processed, rather than doing stale work
+        if not self.detection_lock_.acquire(blocking=False):
+            return
+
+        try:
+            # Copy the image message to a cv image
+            # see http://wiki.ros.org/cv_bridge/Tutorials/ConvertingBetweenROSImagesAndOpenCVImagesPython
+            image = self.cv_bridge_.imgmsg_to_cv2(image_msg, desired_encoding='passthrough')
+
+            # Detections run at a fixed working resolution, since the detection cost grows with the number of pixels
+            detection_width, detection_height = 320, 240
+            scale_x = image.shape[1] / detection_width
+            scale_y = image.shape[0] / detection_height
+
+            # Detect artifacts in the image
+            # The minSize is used to avoid very small detections that are probably noise
+            # A larger scaleFactor searches fewer pyramid levels, trading a little recall for speed
+            if self.cuda_computer_vision_model_ is not None:
+                # Upload the frame once, then do the grayscale conversion, resize and detection on the GPU
+                image_gpu = cv2.cuda_GpuMat()
+                image_gpu.upload(image)
+                image_gray_gpu = cv2.cuda.cvtColor(image_gpu, cv2.COLOR_BGR2GRAY)
+                image_small_gpu = cv2.cuda.resize(image_gray_gpu, (detection_width, detection_height), interpolation=cv2.INTER_AREA)
+                detections_gpu = self.cuda_computer_vision_model_.detectMultiScale(image_small_gpu)
+                detections = self.cuda_computer_vision_model_.convert(detections_gpu)
+            else:
+                # Create a grayscale version, since the simple model below uses this
+                image_gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+                image_small = cv2.resize(image_gray, (detection_width, detection_height), interpolation=cv2.INTER_AREA)
+
+                # Retrieve the pre-trained model
+                stop_sign_model = self.computer_vision_model_
+                detections = stop_sign_model.detectMultiScale(image_small, scaleFactor=1.2, minNeighbors=3, minSize=(20,20))
+
+            # You can set "artifact_found_" to true to signal to "main_loop" that you have found a artifact
+            # You may want to communicate more information
+            # Since the "image_callback" and "main_loop" methods can run at the same time you should protect any shared variables
+            # with a mutex (see "map_lock_" for how the map is shared with the planner)
+            # "artifact_found_" doesn't need a mutex because assigning a single bool is atomic
+            num_detections = len(detections)
+
+            if num_detections > 0:
+                self.artifact_found_ = True
+            else:
+                self.artifact_found_ = False
 
-        # Draw a bounding box rectangle on the image for each detection
-        for(x, y, width, height) in detections:
-            cv2.rectangle(image, (x, y), (x + height, y + width), (0, 255, 0), 5)
+            # Draw a bounding box rectangle on the image for each detection
+            # Detections are scaled back up to the original image size
+            for(x, y, width, height) in detections:
+                x, y = int(x * scale_x), int(y * scale_y)
+                width, height = int(width * scale_x), int(height * scale_y)
+                cv2.rectangle(image, (x, y), (x + width, y + height), (0, 255, 0), 5)
 
-        # Publish the image with the detection bounding boxes
-        image_detection_message = self.cv_bridge_.cv2_to_imgmsg(image, encoding="rgb8")
-        self.image_detections_pub_.publish(image_detection_message)
+            # Publish the image with the detection bounding boxes
+            image_detection_message = self.cv_bridge_.cv2_to_imgmsg(image, encoding="rgb8")
+            self.image_detections_pub_.publish(image_detection_message)
+        finally:
+            self.detection_lock_.release()
 
         #rospy.loginfo('image_callback')
         #rospy.loginfo('artifact_found_: ' + str(self.artifact_found_))
 
     def map_callback(self, map_data):
         # This method is called when a new map is received to update the map
-        self.grid_map_ = map_data
+        # Convert the map to numpy once here, rather than on every planner tick
+        # Read the data through the buffer protocol when possible, otherwise (a tuple from rospy) without an intermediate list
+        height, width = map_data.info.height, map_data.info.width
+        if isinstance(map_data.data, (bytes, bytearray, array.array)):
+            map_np = np.frombuffer(map_data.data, dtype=np.int8).reshape((height, width))
+        else:
+            map_np = np.fromiter(map_data.data, dtype=np.int8, count=height * width).reshape((height, width))
+        origin = (map_data.info.origin.position.x, map_data.info.origin.position.y)
+
+        # Detect frontiers over the whole map when it is first received, resized or moved (cell indices change)
+        # "map_np_" and "frontier_mask_" are only written by this callback, so they can be read here without the lock
+        previous_map = self.map_np_
+        if previous_map is None or previous_map.shape != map_np.shape or self.frontier_origin_ != origin:
+            frontier_mask = detect_frontiers(map_np)
+            self.frontier_origin_ = origin
+
+        # Otherwise only re-check the cells that changed since the last map, plus their neighbours
+        # The planner may still be using the previous mask, so the update is done on a copy
+        else:
+            frontier_mask = self.frontier_mask_
+            changed_y, changed_x = np.nonzero(map_np != previous_map)
+            if changed_y.size > 0:
+                frontier_mask = frontier_mask.copy()
+                update_frontiers(frontier_mask, map_np,
+                                 max(changed_y.min() - 1, 0), min(changed_y.max() + 2, height),
+                                 max(changed_x.min() - 1, 0), min(changed_x.max() + 2, width))
+
+        with self.map_lock_:
+            self.grid_map_ = map_data
+            self.map_np_ = map_np
+            self.map_info_ = map_data.info
+            self.frontier_mask_ = frontier_mask
+            self.map_version_ += 1
         #rospy.loginfo('New map received!')
 
 
+    def goal_done_callback(self, state, result):
+        # This method is called by the move_base action client when a goal finishes (succeeded, aborted, preempted...)
+        # Wake up "main_loop" so the next planner can run without waiting for the rest of its delay
+        self.need_replan_.set()
+
+
     def planner_move_forwards(self, action_state):
         # Simply move forward by 10m
 
@@ -207,14 +322,13 @@ class CaveExplorer:
             rospy.loginfo('Target pose: ' + str(pose_2d.x) + ' ' + str(pose_2d.y) + ' ' + str(pose_2d.theta))
 
             # Send a goal to "move_base" with "self.move_base_action_client_"
-            action_goal = MoveBaseActionGoal()
-            action_goal.goal.target_pose.header.frame_id = "map"
+            action_goal = self.action_goal_
             action_goal.goal_id = self.goal_counter_
             self.goal_counter_ = self.goal_counter_ + 1
-            action_goal.goal.target_pose.pose = pose2d_to_pose(pose_2d)
+            pose2d_to_pose(pose_2d, action_goal.goal.target_pose.pose)
 
             rospy.loginfo('Sending goal to move forward...')
-            self.move_base_action_client_.send_goal(action_goal.goal)
+            self.move_base_action_client_.send_goal(action_goal.goal, done_cb=self.goal_done_callback)
 
 
     def planner_go_to_first_artifact(self, action_state):
@@ -230,14 +344,13 @@ class CaveExplorer:
             pose_2d.theta = -math.pi/2
 
             # Send a goal to "move_base" with "self.move_base_action_client_"
-            action_goal = MoveBaseActionGoal()
-            action_goal.goal.target_pose.header.frame_id = "map"
+            action_goal = self.action_goal_
             action_goal.goal_id = self.goal_counter_
             self.goal_counter_ = self.goal_counter_ + 1
-            action_goal.goal.target_pose.pose = pose2d_to_pose(pose_2d)
+            pose2d_to_pose(pose_2d, action_goal.goal.target_pose.pose)
 
             rospy.loginfo('Sending goal to artifact...')
-            self.move_base_action_client_.send_goal(action_goal.goal)
+            self.move_base_action_client_.send_goal(action_goal.goal, done_cb=self.goal_done_callback)
 
 
     def planner_return_home(self, action_state):
@@ -253,14 +366,13 @@ class CaveExplorer:
             pose_2d.theta = 0
 
             # Send a goal to "move_base" with "self.move_base_action_client_"
-            action_goal = MoveBaseActionGoal()
-            action_goal.goal.target_pose.header.frame_id = "map"
+            action_goal = self.action_goal_
             action_goal.goal_id = self.goal_counter_
             self.goal_counter_ = self.goal_counter_ + 1
-            action_goal.goal.target_pose.pose = pose2d_to_pose(pose_2d)
+            pose2d_to_pose(pose_2d, action_goal.goal.target_pose.pose)
 
             rospy.loginfo('Sending goal of returning home...')
-            self.move_base_action_client_.send_goal(action_goal.goal)
+            self.move_base_action_client_.send_goal(action_goal.goal, done_cb=self.goal_done_callback)
 
     def planner_random_walk(self, action_state):
         # Go to a random location, which may be invalid
@@ -280,14 +392,13 @@ class CaveExplorer:
             pose_2d.theta = random.uniform(0, 2*math.pi)
 
             # Send a goal to "move_base" with "self.move_base_action_client_"
-            action_goal = MoveBaseActionGoal()
-            action_goal.goal.target_pose.header.frame_id = "map"
+            action_goal = self.action_goal_
             action_goal.goal_id = self.goal_counter_
             self.goal_counter_ = self.goal_counter_ + 1
-            action_goal.goal.target_pose.pose = pose2d_to_pose(pose_2d)
+            pose2d_to_pose(pose_2d, action_goal.goal.target_pose.pose)
 
             rospy.loginfo('Sending goal to random walk...')
-            self.move_base_action_client_.send_goal(action_goal.goal)
+            self.move_base_action_client_.send_goal(action_goal.goal, done_cb=self.goal_done_callback)
 
     def planner_random_goal(self, action_state):
         # Go to a random location out of a predefined set
@@ -306,119 +417,77 @@ class CaveExplorer:
             pose_2d.theta = random.uniform(0, 2*math.pi)
 
             # Send a goal to "move_base" with "self.move_base_action_client_"
-            action_goal = MoveBaseActionGoal()
-            action_goal.goal.target_pose.header.frame_id = "map"
+            action_goal = self.action_goal_
             action_goal.goal_id = self.goal_counter_
             self.goal_counter_ = self.goal_counter_ + 1
-            action_goal.goal.target_pose.pose = pose2d_to_pose(pose_2d)
+            pose2d_to_pose(pose_2d, action_goal.goal.target_pose.pose)
 
             rospy.loginfo('Sending random goal...')
-            self.move_base_action_client_.send_goal(action_goal.goal)
+            self.move_base_action_client_.send_goal(action_goal.goal, done_cb=self.goal_done_callback)
 
        
     def planner_to_frontiers(self, action_state):
         # Only proceed if the robot isn't already going to a goal
         if action_state != actionlib.GoalStatus.ACTIVE:
-            rospy.loginfo("Exploring the cave...")
-
-            width = self.grid_map_.info.width
-            height = self.grid_map_.info.height
-            resolution = self.grid_map_.info.resolution
-            origin_x = self.grid_map_.info.origin.position.x
-            origin_y = self.grid_map_.info.origin.position.y
-            map_data = np.array(self.grid_map_.data).reshape((height, width))
-            frontiers = []
-            
-
-            # Detect frontiers by checking neighboring unknown space
-            for y in range(height):
-                for x in range(width):
-                    if map_data[y, x] == 0:  # 0 means free space
-                        neighbours = [(x + dx, y + dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1] if (dx != 0 or dy != 0) and 0 <= x + dx < width and 0 <= y + dy < height]
-                        if any(map_data[ny, nx] == -1 for nx, ny in neighbours):
-                            wx, wy = x * resolution + origin_x, y * resolution + origin_y
-                            frontiers.append((wx, wy))
-            rospy.loginfo(f"Detected {len(frontiers)} frontiers and largest is {max(frontiers, key=len)}")
-            
-            # Group nearby frontiers
-            grouped_frontiers = []
-            queue = [(int((wx - origin_x) / resolution), int((wy - origin_y) / resolution)) for wx, wy in frontiers]
-            visited = []  # Initialize visited here
-
-            while queue:
-                current = queue.pop(0)
-                
-                if current in visited:
-                    continue
-                
-                # Start a new group
-                current_group = []
-                to_visit = [current]
-
-                while to_visit:
-                    frontier = to_visit.pop(0)
-                    if frontier in visited:
-                        continue
-                    
-                    visited.append(frontier)
-                    current_group.append(frontier)
-
-                    # Get neighbors
-                    neighbours = [(frontier[0] + dx, frontier[1] + dy) for dx in [-1, 0, 1] for dy in [-1, 0, 1] 
-                                if (dx != 0 or dy != 0) and 
-                                0 <= frontier[0] + dx < width and 
-                                0 <= frontier[1] + dy < height]
-                    
-                    for neighbour in neighbours:
-                        if neighbour in queue:
-                            queue.remove(neighbour)
-                            to_visit.append(neighbour)
-
-                # Check if the group size is greater than 10
-                if len(current_group) > 500:
-                    grouped_frontiers.append(current_group)
-
-            
-            if frontiers:
-                robot_pose = Pose2D()
+            # Get the robot pose, falling back to the last known pose if the transform lookup fails
+            try:
+                robot_pose = self.get_pose_2d()
+                self.last_pose_ = robot_pose
+            except tf.Exception as e:
+                if self.last_pose_ is None:
+                    rospy.logwarn(f"Could not get the robot pose: {e}")
+                    return
+                rospy.logwarn(f"Could not get the robot pose, using the last known pose: {e}")
+                robot_pose = self.last_pose_
+
+            # Take a consistent snapshot of the frontiers and map metadata, then release the lock before the heavy processing
+            with self.map_lock_:
+                map_info = self.map_info_
+                frontier_mask = self.frontier_mask_
+                map_version = self.map_version_
+
+            rospy.loginfo(f"Exploring the cave (map version {map_version})...")
+
+            resolution = map_info.resolution
+            origin_x = map_info.origin.position.x
+            origin_y = map_info.origin.position.y
+
+            # Group nearby frontiers into 8-connected regions, getting the size and centroid of each group in one pass
+            num_groups, labels, stats, centroids = cv2.connectedComponentsWithStats(frontier_mask.view(np.uint8), connectivity=8)
+            group_sizes = stats[1:, cv2.CC_STAT_AREA]
+            largest_group_size = group_sizes.max() if group_sizes.size > 0 else 0
+            rospy.loginfo(f"Detected {group_sizes.sum()} frontiers in {num_groups - 1} groups and largest has size {largest_group_size}")
+
+            # Only keep groups with more than 500 cells
+            grouped_frontiers = np.flatnonzero(group_sizes > 500) + 1
+
+            if grouped_frontiers.size > 0:
                 robot_x = robot_pose.x
                 robot_y = robot_pose.y
 
-                closest_frontier_group = None
-                min_distance = float('inf')
+                # Convert the group centroids (x, y) to world coordinates
+                centroids_world = centroids[grouped_frontiers] * resolution + np.array([origin_x, origin_y])
 
                 # Find the closest frontier group
-                for group in grouped_frontiers:
-                    centroid_x = sum([cell[0] for cell in group]) / len(group)
-                    centroid_y = sum([cell[1] for cell in group]) / len(group)
-
-                    # Convert centroid to world coordinates
-                    wx, wy = centroid_x * resolution + origin_x, centroid_y * resolution + origin_y
-
-                    # Compute the distance between robot and frontier group
-                    distance = ((wx - robot_x) ** 2 + (wy - robot_y) ** 2) ** 0.5
-
-                    if distance < min_distance:
-                        min_distance = distance
-                        closest_frontier_group = group
+                distances = np.linalg.norm(centroids_world - np.array([robot_x, robot_y]), axis=1)
+                closest = distances.argmin()
+                closest_frontier_group = grouped_frontiers[closest]
 
-                centroid_x = sum([cell[0] for cell in closest_frontier_group]) / len(closest_frontier_group)
-                centroid_y = sum([cell[1] for cell in closest_frontier_group]) / len(closest_frontier_group)
-                wx, wy = centroid_x * resolution + origin_x, centroid_y * resolution + origin_y
+                wx, wy = centroids_world[closest]
+                group_size = group_sizes[closest_frontier_group - 1]
 
                 # Send a goal to "move_base"
                 pose_2d = Pose2D()
                 pose_2d.x = wx
                 pose_2d.y = wy
 
-                action_goal = MoveBaseActionGoal()
-                action_goal.goal.target_pose.header.frame_id = "map"
+                action_goal = self.action_goal_
                 action_goal.goal_id = self.goal_counter_
                 self.goal_counter_ += 1
-                action_goal.goal.target_pose.pose = pose2d_to_pose(pose_2d)
+                pose2d_to_pose(pose_2d, action_goal.goal.target_pose.pose)
 
-                rospy.loginfo(f'Sending goal to the closest frontier at ({wx}, {wy}) with size {len(closest_frontier_group)}')
-                self.move_base_action_client_.send_goal(action_goal.goal)
+                rospy.loginfo(f'Sending goal to the closest frontier at ({wx}, {wy}) with size {group_size}')
+                self.move_base_action_client_.send_goal(action_goal.goal, done_cb=self.goal_done_callback)
 
             # When no frontiers is left
             else:
@@ -480,8 +549,9 @@ class CaveExplorer:
 
 
             #######################################################
-            # Delay so the loop doesn't run too fast
-            rospy.sleep(0.2)
+            # Delay so the loop doesn't run too fast, but wake up as soon as move_base finishes a goal
+            self.need_replan_.wait(timeout=0.2)
+            self.need_replan_.clear()
 
 if __name__ == '__main__':
 